@@ -1,22 +1,25 @@
-import os
-from faster_whisper import WhisperModel
+import sys
+import pathlib
+from worker import create_model
 
-file_path = r"server/uploads/1763621637765-test.m4a"
-# 转换为绝对路径
-file_path = os.path.abspath(file_path)
+if len(sys.argv) < 2:
+    print("Usage: python test_check_file.py <audio_file>")
+    sys.exit(0)
 
-if not os.path.exists(file_path):
+file_path = pathlib.Path(sys.argv[1]).resolve()
+
+try:
+    st = file_path.stat()
+except FileNotFoundError:
     print(f"File not found: {file_path}")
 else:
-    print(f"File size: {os.path.getsize(file_path)}")
+    print(f"File size: {st.st_size}")
     try:
-        # 尝试简单加载
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        model_path = os.path.join(base_dir, "models", "large-v3")
-        print(f"Loading model from {model_path}")
-        model = WhisperModel(model_path, device="cuda", compute_type="int8")
+        # 与 worker 共用 create_model()，设备/精度等配置保持一致
+        print("Loading model via worker.create_model()")
+        model = create_model()
         print("Model loaded. Transcribing...")
-        segments, info = model.transcribe(file_path, beam_size=1) # beam_size 1 for speed
+        segments, info = model.transcribe(str(file_path), beam_size=1) # beam_size 1 for speed
         # 只读第一个 segment
         for segment in segments:
             print(segment.text)
@@ -24,4 +27,3 @@ else:
         print("Transcribe check passed")
     except Exception as e:
         print(f"Error: {e}")
-
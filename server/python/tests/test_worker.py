@@ -0,0 +1,32 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+orjson = pytest.importorskip("orjson")
+pytest.importorskip("faster_whisper")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import worker
+
+def test_segment_with_numpy_word_times_is_serializable():
+    # word_timestamps 开启时 faster-whisper 返回 numpy.float64 时间
+    words = [
+        SimpleNamespace(start=np.float64(1.5), end=np.float64(1.9), word=" Goal"),
+        SimpleNamespace(start=np.float64(2.0), end=np.float64(2.4), word=" again"),
+    ]
+    segment = SimpleNamespace(start=np.float64(1.5), end=np.float64(2.4), text=" Goal again", words=words)
+
+    seg_data = worker.segment_to_dict(segment)
+
+    assert type(seg_data["start"]) is float
+    assert all(type(w["start"]) is float and type(w["end"]) is float for w in seg_data["words"])
+    decoded = orjson.loads(worker.json_encoder({"type": "segment", "id": 1, "data": seg_data}))
+    assert decoded["data"]["words"][1] == {"start": 2.0, "end": 2.4, "word": " again"}
+
+def test_segment_without_words_has_no_words_key():
+    segment = SimpleNamespace(start=0.0, end=1.0, text=" hi", words=None)
+
+    assert worker.segment_to_dict(segment) == {"start": 0.0, "end": 1.0, "text": " hi"}
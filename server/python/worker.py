@@ -1,13 +1,91 @@
 import sys
-import json
+import io
 import os
-from faster_whisper import WhisperModel
+import hashlib
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+import numpy as np
+import orjson
+import soundfile as sf
 
-# 强制 stdout 使用 utf-8
-sys.stdout.reconfigure(encoding='utf-8')
+# CTranslate2 在加载时读取这些变量，必须在 import faster_whisper 之前设置（已设置的以外部为准）。
+# 常驻进程跑数小时后默认缓存分配器会产生显存碎片，长音频中途 OOM；cuda_malloc_async 可避免碎片。
+os.environ.setdefault("CT2_CUDA_ALLOCATOR", "cuda_malloc_async")
+os.environ.setdefault("CT2_CUDA_CACHING_ALLOCATOR_CONFIG", "4,3,10,104857600")
+os.environ.setdefault("CT2_USE_EXPERIMENTAL_PACKED_GEMM", "1")
+
+from faster_whisper import WhisperModel, BatchedInferencePipeline
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MODEL_PATH = os.path.join(BASE_DIR, "models", "large-v3")
+CACHE_DIR = os.environ.get("WHISPER_CACHE_DIR") or os.path.join(BASE_DIR, "cache", "transcribe")
+CACHE_SAMPLE_BYTES = 1024 * 1024
+
+def json_encoder(msg: dict) -> bytes:
+    return orjson.dumps(msg) + b"\n"
+
+def resolve_encoder():
+    """WHISPER_WIRE=msgpack 时使用 msgpack 帧，默认每行一个 JSON（Node 侧读取同一环境变量）"""
+    if os.environ.get("WHISPER_WIRE") != "msgpack":
+        return json_encoder
+
+    import msgpack
+
+    def msgpack_encoder(msg: dict) -> bytes:
+        # 4 字节大端长度前缀 + msgpack 负载，比 JSON 编码更快、体积更小，适合大量 segment 消息
+        body = msgpack.packb(msg)
+        return struct.pack(">I", len(body)) + body
+
+    return msgpack_encoder
+
+class MessageWriter:
+    """向 Node 侧输出消息的缓冲写入器。
+
+    消息由 encoder 编码（默认 orjson 在 C 里直接编码为 UTF-8 JSON 行），写入 64KB 缓冲区，
+    避免每个 segment 一次 write 系统调用。
+    满足以下任一条件才真正 flush：调用方要求（如 result）、积压超过 flush_bytes、
+    或距第一条未刷出的消息已过 flush_interval 秒（定时器，保证进度仍然实时）。
+    """
+
+    def __init__(self, stream, encoder=json_encoder, flush_bytes: int = 16 * 1024, flush_interval: float = 0.05):
+        self._out = io.BufferedWriter(stream, buffer_size=65536)
+        self._encoder = encoder
+        self._flush_bytes = flush_bytes
+        self._flush_interval = flush_interval
+        self._queued = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def send(self, msg: dict, flush: bool = False):
+        data = self._encoder(msg)
+        with self._lock:
+            self._out.write(data)
+            self._queued += len(data)
+            if flush or self._queued >= self._flush_bytes:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._queued:
+            self._out.flush()
+            self._queued = 0
+
+_writer = MessageWriter(io.FileIO(sys.stdout.fileno(), "wb", closefd=False), encoder=resolve_encoder())
+
+def send_message(msg: dict, flush: bool = False):
+    _writer.send(msg, flush=flush)
 
 def ensure_model_path():
     if not os.path.exists(MODEL_PATH):
@@ -18,29 +96,233 @@ def ensure_model_path():
         if not os.path.exists(os.path.join(MODEL_PATH, f)):
             raise RuntimeError(f"Model file missing: {f} in {MODEL_PATH}")
 
+def resolve_compute_type(device: str) -> str:
+    """未设置 WHISPER_COMPUTE_TYPE 时的默认精度。
+
+    GPU 上优先 int8_float16：large-v3 解码受显存带宽限制，权重 int8、激活 float16
+    可让显存约减半且更快（CTranslate2 加载时量化，无需重新转换模型）。
+    设备不支持 int8（如 RTX 50 系）时回退到 auto，由 CTranslate2 自行选择。
+    """
+    env_value = os.environ.get("WHISPER_COMPUTE_TYPE")
+    if env_value:
+        return env_value
+    if device == "cuda":
+        try:
+            import ctranslate2
+            if "int8_float16" in ctranslate2.get_supported_compute_types("cuda"):
+                return "int8_float16"
+        except Exception as e:
+            sys.stderr.write(f"[Worker] Failed to probe CUDA compute types: {e}\n")
+    return "auto"
+
+def resolve_batch_size() -> int:
+    """批量推理的窗口数：多个 30s 窗口合并成一次 encoder 调用，默认 1（逐窗口解码，不批量）。
+
+    批量路径没有温度回退与阈值过滤（见 transcribe_with_model），因此需 WHISPER_BATCH_SIZE>1 显式开启（GPU 上建议 8）。
+    """
+    return max(1, int(os.environ.get("WHISPER_BATCH_SIZE", "1")))
+
+def resolve_beam_size(device: str, batched: bool = False) -> int:
+    """解码 beam 数。GPU 逐窗口路径默认 1（贪心 + 温度回退，解码约快 5 倍）；
+    批量路径没有温度回退，贪心解码缺少兜底，因此与 CPU 一样保持 5。"""
+    default = "1" if device == "cuda" and not batched else "5"
+    return max(1, int(os.environ.get("WHISPER_BEAM_SIZE", default)))
+
+def resolve_num_workers() -> int:
+    """可并发执行的转写请求数（WhisperModel num_workers 与线程池大小）。
+
+    QueueService 目前同一时间只派发一个转写任务，多开只会多占 GPU 副本显存而没有吞吐收益，因此默认 1。
+    """
+    return max(1, int(os.environ.get("WHISPER_NUM_WORKERS", "1")))
+
+def warmup_model(model: Union[WhisperModel, BatchedInferencePipeline]):
+    """启动时预加载 Silero VAD（否则首个请求才懒加载），并跑一次 1s 静音转写完成初始化，
+    降低首个用户请求的冷启动延迟。model 为 create_model() 最终返回的对象，可选预热与真实请求走同一路径。"""
+    batched = isinstance(model, BatchedInferencePipeline)
+    whisper = model.model if batched else model
+    try:
+        from faster_whisper.vad import get_vad_model
+        get_vad_model()
+        segments, _ = whisper.transcribe(np.zeros(16000, dtype=np.float32), vad_filter=True, beam_size=1)
+        list(segments)
+        sys.stderr.write("[Worker] Warmup done (VAD loaded)\n")
+    except Exception as e:
+        sys.stderr.write(f"[Worker] Warmup failed: {e}\n")
+
+    # 可选：按真实请求的 beam 数/批大小完整跑一次 30s 窗口编解码，触发 CUDA 内核选择/自动调优，
+    # 消除首个请求 1~3s 的尾延迟。会延长启动时间，因此需 WHISPER_WARMUP=1 显式开启。
+    if os.environ.get("WHISPER_WARMUP") != "1":
+        return
+    try:
+        window = 16000 * 30
+        kwargs = {
+            "beam_size": resolve_beam_size(os.environ.get("WHISPER_DEVICE", "cuda"), batched),
+            "vad_filter": False,
+            "language": "zh",
+        }
+        if batched:
+            # 关闭 VAD 时批量路径需显式给出切分点（单位：采样点），凑满一个 batch 的 30s 窗口
+            batch_size = resolve_batch_size()
+            kwargs["batch_size"] = batch_size
+            kwargs["without_timestamps"] = False
+            kwargs["clip_timestamps"] = [
+                {"start": i * window, "end": (i + 1) * window} for i in range(batch_size)
+            ]
+            audio = np.zeros(window * batch_size, dtype=np.float32)
+        else:
+            audio = np.zeros(window, dtype=np.float32)
+        segments, _ = model.transcribe(audio, **kwargs)
+        list(segments)
+        sys.stderr.write("[Worker] Warmup done (30s window)\n")
+    except Exception as e:
+        sys.stderr.write(f"[Worker] 30s warmup failed: {e}\n")
+
 def create_model():
     ensure_model_path()
     device = os.environ.get("WHISPER_DEVICE", "cuda")
-    compute_type = os.environ.get("WHISPER_COMPUTE_TYPE", "float16")
+    compute_type = resolve_compute_type(device)
     sys.stderr.write(f"[Worker] Using device={device}, compute_type={compute_type}\n")
-    return WhisperModel(MODEL_PATH, device=device, compute_type=compute_type)
+    model = WhisperModel(
+        MODEL_PATH,
+        device=device,
+        compute_type=compute_type,
+        num_workers=resolve_num_workers(),
+        cpu_threads=max(1, (os.cpu_count() or 2) // 2)
+    )
+    resolved = getattr(model.model, "compute_type", compute_type)
+    sys.stderr.write(f"[Worker] Resolved compute_type={resolved}\n")
+
+    batch_size = resolve_batch_size()
+    if batch_size > 1:
+        sys.stderr.write(f"[Worker] Using batched inference, batch_size={batch_size}\n")
+        model = BatchedInferencePipeline(model=model)
+    warmup_model(model)
+    return model
+
+_thread_state = threading.local()
+
+def thread_model(model):
+    """返回当前线程专用的模型。BatchedInferencePipeline 在实例上保存单次调用状态（last_speech_timestamp），
+    并发请求共用同一实例会互相破坏词级时间戳；因此每个线程各持有一个包装同一 WhisperModel 的 pipeline。"""
+    if not isinstance(model, BatchedInferencePipeline):
+        return model
+    pipeline = getattr(_thread_state, "pipeline", None)
+    if pipeline is None or pipeline.model is not model.model:
+        pipeline = BatchedInferencePipeline(model=model.model)
+        _thread_state.pipeline = pipeline
+    return pipeline
+
+def probe_duration(file_path: str) -> float:
+    """读取音频时长(秒)。WAV 只读文件头；其他容器用 PyAV（faster-whisper 自带依赖）。失败返回 0。"""
+    try:
+        return float(sf.info(file_path).duration)
+    except Exception:
+        pass
+    try:
+        import av
+        with av.open(file_path) as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception as e:
+        sys.stderr.write(f"[Worker] Failed to probe duration of {file_path}: {e}\n")
+    return 0.0
+
+def load_audio(file_path: str):
+    """Node 侧提取的音频已是 16kHz 单声道 WAV，直接在进程内读成 float32 数组，
+    省去 faster-whisper 内部再解码/重采样一次。其他格式原样返回路径交给 faster-whisper 解码。"""
+    try:
+        info = sf.info(file_path)
+    except Exception:
+        return file_path
+    if info.samplerate != 16000 or info.channels != 1:
+        return file_path
+    audio, _ = sf.read(file_path, dtype="float32")
+    return audio
+
+def cache_enabled() -> bool:
+    """转写结果缓存，WHISPER_CACHE=1 开启（调试时反复转写同一文件可直接命中）"""
+    return os.environ.get("WHISPER_CACHE") == "1"
+
+def cache_key(file_path: str, transcribe_kwargs: dict) -> str:
+    """以 文件大小 + 首尾各 1MB 内容 + 模型与转写参数 计算缓存 key，不必读完整个文件。"""
+    h = hashlib.blake2b(digest_size=20)
+    size = os.path.getsize(file_path)
+    h.update(str(size).encode())
+    with open(file_path, "rb") as f:
+        h.update(f.read(CACHE_SAMPLE_BYTES))
+        if size > CACHE_SAMPLE_BYTES:
+            f.seek(max(CACHE_SAMPLE_BYTES, size - CACHE_SAMPLE_BYTES))
+            h.update(f.read(CACHE_SAMPLE_BYTES))
+    compute_type = resolve_compute_type(os.environ.get("WHISPER_DEVICE", "cuda"))
+    h.update(f"{MODEL_PATH}|{compute_type}".encode())
+    h.update(orjson.dumps(transcribe_kwargs, option=orjson.OPT_SORT_KEYS))
+    return h.hexdigest()
+
+def load_cached_result(key: str):
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    try:
+        with open(path, "rb") as f:
+            result = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None
+    # 更新 mtime，淘汰时按最近使用排序（LRU）
+    os.utime(path)
+    return result
+
+def save_cached_result(key: str, result: dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"{key}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(result))
+        os.replace(tmp_path, path)
+
+        max_entries = int(os.environ.get("WHISPER_CACHE_MAX_ENTRIES", "200"))
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".json")]
+        if len(entries) > max_entries:
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for e in entries[:len(entries) - max_entries]:
+                os.remove(e.path)
+    except Exception as e:
+        sys.stderr.write(f"[Worker] Failed to write transcription cache: {e}\n")
+
+def segment_to_dict(segment) -> dict:
+    """开启 word_timestamps 时对齐结果为 numpy.float64（并会回写到 segment.start/end），
+    orjson 无法序列化 float 子类，这里统一转成内置 float。"""
+    seg_data = {
+        "start": float(segment.start),
+        "end": float(segment.end),
+        "text": segment.text
+    }
+    if segment.words:
+        seg_data["words"] = [
+            {"start": float(w.start), "end": float(w.end), "word": w.word} for w in segment.words
+        ]
+    return seg_data
 
 def transcribe_with_model(
-    model: WhisperModel,
+    model: Union[WhisperModel, BatchedInferencePipeline],
     file_path: str,
     total_duration: float = 0,
-    on_progress=None,
     on_segment=None,
     options=None
 ):
-    """total_duration: 音频总时长(秒)，用于计算进度。on_progress(req_id, progress_pct) 每段后可选调用。"""
+    """total_duration: 音频总时长(秒)，用于计算进度。
+    on_segment(seg_data, progress_pct) 每段调用一次；进度变化不足 0.5% 或无法计算时 progress_pct 为 None。"""
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
     opts = options or {}
     condition_on_previous_text = opts.get("condition_on_previous_text")
+    batched = isinstance(model, BatchedInferencePipeline)
+    beam_size = opts.get("beam_size") or resolve_beam_size(os.environ.get("WHISPER_DEVICE", "cuda"), batched)
     transcribe_kwargs = {
-        "beam_size": 5,
+        "beam_size": beam_size,
+        # 逐窗口路径上，贪心解码遇到难段（触发压缩比/log_prob 阈值）时按温度回退重采样，保证质量；
+        # 批量路径只取 temperature[0]，不做回退
+        "best_of": 5,
+        "temperature": [0.0, 0.2, 0.4, 0.6, 0.8],
         "language": opts.get("language"),
         # --- 🛡️ VAD 最终定版 (0.15 / 300 / 200) ---
         "vad_filter": True,
@@ -55,7 +337,8 @@ def transcribe_with_model(
             # 【胶水】200ms：保护首尾音，防止切分太快吞字。
             "speech_pad_ms": 200
         },
-        # "word_timestamps": True,
+        # 词级时间戳需要逐段做交叉注意力对齐，解码开销约翻倍；仅在请求显式开启时使用
+        "word_timestamps": bool(opts.get("word_timestamps")),
         "task": opts.get("task", "transcribe"),
         "initial_prompt": opts.get("initial_prompt") or "",
 
@@ -64,66 +347,119 @@ def transcribe_with_model(
         # 【修改】体育场景强制设为 False
         "condition_on_previous_text": False,
 
-        # --- 2. 阈值全关 (解决丢失几十秒的核心) ---
-
-        # [关键修改] 设为 None。
-        # 告诉模型：哪怕你觉得这是纯噪音 (Probability 99.9%)，也得给我编个字出来！
-        # 只有这样才能填补那个 30秒的坑。
-        "no_speech_threshold": None,
+        # --- 2. 阈值默认开启 (faster-whisper 默认值)，可按请求关闭 ---
 
-        # [关键修改] 设为 None。
-        # 告诉模型：哪怕你卡住了，复读了 100 遍 "Goal"，也别删掉，原样输出。
-        # 我们宁要复读机，不要时间空洞。
-        "compression_ratio_threshold": None,
-
-        "log_prob_threshold": None, # 保持关闭
+        # 阈值全关时，坏音频上解码器会卡在复读循环 ("Goal Goal Goal...") 里跑满整个 30s 窗口，
+        # 单个窗口就能拖慢数秒。压缩比/log_prob 超阈值时按上面的温度列表重试。
+        # no_speech 必须与 log_prob 配对：只有 no_speech_prob > 0.6 且 avg_logprob < -1.0 才跳过窗口，
+        # 否则观众噪音里 no_speech_prob 偏高的解说会被整窗丢弃（no_speech 本身不触发温度重试）。
+        # 请求中显式传 None 可关闭（宁要复读机，不要时间空洞）。
+        # 仅逐窗口路径生效：批量路径不读取这三个阈值（见下方 batched 分支）。
+        "no_speech_threshold": 0.6,
+        "compression_ratio_threshold": 2.4,
+        "log_prob_threshold": -1.0,
     }
-    if opts.get("compression_ratio_threshold") is not None:
-        transcribe_kwargs["compression_ratio_threshold"] = opts.get("compression_ratio_threshold")
+    for key in ("no_speech_threshold", "compression_ratio_threshold", "log_prob_threshold"):
+        if key in opts:
+            transcribe_kwargs[key] = opts[key]
+    if transcribe_kwargs["word_timestamps"]:
+        sys.stderr.write("[Worker] word_timestamps enabled for this request (slower decoding)\n")
+    if batched:
+        # 批量路径默认 without_timestamps=True，每个 VAD 块(最长 30s)只出一个 segment，这里显式打开时间戳。
+        # 注意：批量路径只使用 temperature[0]，且不读取 no_speech/compression_ratio/log_prob 阈值，
+        # 即没有温度回退，也不会按阈值跳过窗口；需要这些行为时设 WHISPER_BATCH_SIZE=1 走逐窗口路径。
+        transcribe_kwargs["batch_size"] = resolve_batch_size()
+        transcribe_kwargs["without_timestamps"] = False
+
+    key = None
+    if cache_enabled():
+        key = cache_key(file_path, transcribe_kwargs)
+        cached = load_cached_result(key)
+        if cached is not None:
+            sys.stderr.write(f"[Worker] Transcription cache hit: {key}\n")
+            # Node 侧依赖 segment 消息逐段入库，命中缓存时同样回放
+            if on_segment:
+                cached_segments = cached["segments"]
+                for i, seg_data in enumerate(cached_segments):
+                    on_segment(seg_data, 100.0 if i == len(cached_segments) - 1 else None)
+            return cached
 
     segments, info = model.transcribe(
-        file_path,
+        load_audio(file_path),
         **transcribe_kwargs
     )
 
     result_segments = []
-    full_text = ""
+    text_parts = []
     last_pct = -1
 
     for segment in segments:
-        seg_data = {
-            "start": segment.start,
-            "end": segment.end,
-            "text": segment.text
-        }
+        seg_data = segment_to_dict(segment)
         result_segments.append(seg_data)
-        full_text += segment.text
+        text_parts.append(segment.text)
 
         if on_segment:
-            on_segment(seg_data)
-
-        if on_progress and total_duration > 0:
-            pct = min(100.0, round((segment.end / total_duration) * 100, 1))
-            if pct > last_pct:
-                last_pct = pct
-                on_progress(pct)
+            # 进度随 segment 一起发送，每段只编码/写出一条消息
+            progress_pct = None
+            if total_duration > 0:
+                pct = min(100.0, round((segment.end / total_duration) * 100, 1))
+                # 进度变化不足 0.5% 不上报，减少消息量
+                if pct - last_pct >= 0.5:
+                    last_pct = pct
+                    progress_pct = pct
+            on_segment(seg_data, progress_pct)
 
-    return {
+    result = {
         "language": info.language,
         "language_probability": info.language_probability,
         "duration": info.duration,
         "segments": result_segments,
-        "text": full_text
+        "text": "".join(text_parts)
     }
+    if key:
+        save_cached_result(key, result)
+    return result
 
-def run_single_file(audio_file: str):
-    sys.stderr.write(f"[Worker] Received audio file: {audio_file}\n")
+def handle_request(model, payload: dict):
+    """处理单个转写请求，segment/result 消息均带请求 id，可在线程池中并发执行。"""
+    req_id = payload.get("id")
     try:
-        model = create_model()
-        result = transcribe_with_model(model, audio_file)
-        print(json.dumps(result, ensure_ascii=False))
+        audio_file = payload.get("audio_file")
+        if not audio_file:
+            raise ValueError("audio_file is required")
+        # 调用方未传时长时自行探测，保证进度始终可用
+        total_duration = float(payload.get("duration") or 0) or probe_duration(audio_file)
+
+        def send_segment(seg, pct=None):
+            msg = {"type": "segment", "id": req_id, "data": seg}
+            if pct is not None:
+                msg["progress_pct"] = pct
+            send_message(msg)
+
+        options = {
+            "initial_prompt": payload.get("initial_prompt", ""),
+            "task": payload.get("task", "transcribe"),
+            "language": payload.get("language"),
+            "condition_on_previous_text": payload.get("condition_on_previous_text", True),
+            "beam_size": payload.get("beam_size"),
+            "word_timestamps": payload.get("word_timestamps", False)
+        }
+        # 阈值只在请求显式携带时覆盖默认值（null 表示关闭）
+        for key in ("no_speech_threshold", "compression_ratio_threshold", "log_prob_threshold"):
+            if key in payload:
+                options[key] = payload[key]
+
+        result = transcribe_with_model(
+            thread_model(model), audio_file,
+            total_duration=total_duration,
+            on_segment=send_segment,
+            options=options
+        )
+        response = {"type": "result", "id": req_id, "result": result}
     except Exception as e:
-        print(json.dumps({"error": f"Transcription failed: {str(e)}"}, ensure_ascii=False))
+        response = {"type": "result", "id": req_id, "error": str(e)}
+
+    send_message(response, flush=True)
 
 def run_server():
     sys.stderr.write("[Worker] Starting server mode...\n")
@@ -131,59 +467,42 @@ def run_server():
         model = create_model()
     except Exception as e:
         sys.stderr.write(f"[Worker] Failed to load model: {e}\n")
-        print(json.dumps({"error": str(e)}, ensure_ascii=False))
+        send_message({"error": str(e)}, flush=True)
         return
 
     sys.stderr.write("[Worker] Model loaded. Waiting for tasks...\n")
 
-    while True:
-        line = sys.stdin.readline()
-        if not line:
-            break
-        line = line.strip()
-        if not line:
-            continue
+    # 与 WhisperModel 的 num_workers 对应：WHISPER_NUM_WORKERS>1 时多个请求可在 GPU 上重叠（N+1 的 encoder 与 N 的 decoder）
+    pool = ThreadPoolExecutor(max_workers=resolve_num_workers())
+    try:
+        # 直接迭代 BufferedReader：EOF 时循环自然结束
+        for raw in sys.stdin.buffer:
+            if raw.isspace():
+                continue
 
-        payload = None
-        try:
-            payload = json.loads(line)
-            audio_file = payload.get("audio_file")
-            req_id = payload.get("id")
-            total_duration = float(payload.get("duration") or 0)
-            if not audio_file:
-                raise ValueError("audio_file is required")
-
-            def send_progress(pct):
-                msg = {"type": "progress", "id": req_id, "progress_pct": pct}
-                print(json.dumps(msg, ensure_ascii=False), flush=True)
-
-            def send_segment(seg):
-                msg = {"type": "segment", "id": req_id, "data": seg}
-                print(json.dumps(msg, ensure_ascii=False), flush=True)
-
-            result = transcribe_with_model(
-                model, audio_file,
-                total_duration=total_duration,
-                on_progress=send_progress if total_duration > 0 else None,
-                on_segment=send_segment,
-                options={
-                    "initial_prompt": payload.get("initial_prompt", ""),
-                    "task": payload.get("task", "transcribe"),
-                    "language": payload.get("language"),
-                    "condition_on_previous_text": payload.get("condition_on_previous_text", True),
-                    "compression_ratio_threshold": payload.get("compression_ratio_threshold")
-                }
-            )
-            response = {"type": "result", "id": req_id, "result": result}
-        except Exception as e:
-            response = {"type": "result", "id": payload.get("id") if payload else None, "error": str(e)}
+            try:
+                # orjson 可直接解析 bytes，并容忍结尾的换行
+                payload = orjson.loads(raw)
+            except Exception as e:
+                send_message({"type": "result", "id": None, "error": str(e)}, flush=True)
+                continue
+            if not isinstance(payload, dict):
+                send_message({"type": "result", "id": None, "error": "request must be a JSON object"}, flush=True)
+                continue
+
+            # 握手：模型加载完成后才会读 stdin，收到 pong 即表示可以派发任务
+            if payload.get("type") == "ping":
+                send_message({"type": "pong", "id": payload.get("id")}, flush=True)
+                continue
 
-        print(json.dumps(response, ensure_ascii=False), flush=True)
+            pool.submit(handle_request, model, payload)
+    finally:
+        pool.shutdown(wait=True)
+        _writer.flush()
 
 if __name__ == "__main__":
     if len(sys.argv) >= 2 and sys.argv[1] == "--server":
         run_server()
-    elif len(sys.argv) >= 2:
-        run_single_file(sys.argv[1])
     else:
-        print(json.dumps({"error": "Usage: python worker.py <file_path> | --server"}, ensure_ascii=False))
+        # 单文件模式每次都要重新加载模型，已移除；统一走常驻 server 模式
+        send_message({"error": "Usage: python worker.py --server"}, flush=True)
@@ -214,7 +214,7 @@ if not exist "%PYTHON_WORKER_DIR%" (
                 ".venv\Scripts\python.exe" -m pip install -r requirements.txt
             ) else (
                 echo [WARNING] requirements.txt not found, falling back to manual package list...
-                ".venv\Scripts\python.exe" -m pip install faster-whisper
+                ".venv\Scripts\python.exe" -m pip install faster-whisper orjson soundfile
             )
 
             if !errorLevel! neq 0 (
@@ -8,6 +8,7 @@ import path from 'node:path';
 import fs from 'node:fs';
 import { getPythonWorkerPath, getPythonPath } from './utils/paths';
 import { logger } from './utils/logger';
+import { createMsgpackFrameReader } from './utils/msgpack';
 import { runTranslation } from './services/translation';
 import {
   getPromptConfigForScenario,
@@ -50,7 +51,9 @@ interface WorkerOptions {
   task?: 'transcribe' | 'translate';
   language?: string | null;
   condition_on_previous_text?: boolean;
-  compression_ratio_threshold?: number;
+  /** null 表示关闭该阈值；不传则使用 worker 默认值 */
+  compression_ratio_threshold?: number | null;
+  no_speech_threshold?: number | null;
 }
 
 interface TranscriptionSegment {
@@ -79,8 +82,15 @@ class QueueService {
     resolve: (value: any) => void;
     reject: (reason?: any) => void;
     taskId: string;
+    requestId: number;
   } | null = null;
   private workerRequestId = 0;
+  /** worker 就绪（模型加载完成，已回应 ping）的 Promise，进程退出时清空 */
+  private pythonWorkerReady: Promise<void> | null = null;
+  private workerReadyWaiter: {
+    resolve: () => void;
+    reject: (reason?: any) => void;
+  } | null = null;
   /** 进度写库节流：上次写入的进度与时间 */
   private progressThrottleLastPct = 0;
   private progressThrottleLastTs = 0;
@@ -136,6 +146,11 @@ class QueueService {
       if (this.pythonWorker) {
         this.pythonWorker.kill('SIGTERM');
         this.pythonWorker = null;
+        this.pythonWorkerReady = null;
+        if (this.workerReadyWaiter) {
+          this.workerReadyWaiter.reject(new Error('Task cancelled'));
+          this.workerReadyWaiter = null;
+        }
       }
     }
 
@@ -565,28 +580,47 @@ class QueueService {
 
   /**
    * 确保 Python Worker 在 server 模式下运行（单实例）
+   * 启动后发送 ping，收到 pong 即表示模型已加载完成
    */
-  private ensurePythonWorker() {
-    if (this.pythonWorker) return;
+  private ensurePythonWorker(): Promise<void> {
+    if (this.pythonWorker && this.pythonWorkerReady) return this.pythonWorkerReady;
 
     const workerScript = getPythonWorkerPath();
     const pythonPath = getPythonPath();
 
     logger.info({ pythonPath, workerScript }, 'Starting persistent worker');
-    this.pythonWorker = spawn(pythonPath, [workerScript, '--server']);
-    this.pythonWorker.stdout.setEncoding('utf-8');
+    this.pythonWorkerReady = new Promise<void>((resolve, reject) => {
+      this.workerReadyWaiter = { resolve, reject };
+    });
+    // 避免无人等待时出现 unhandled rejection
+    this.pythonWorkerReady.catch(() => {});
+    const worker = spawn(pythonPath, [workerScript, '--server']);
+    this.pythonWorker = worker;
     this.pythonWorker.stderr.setEncoding('utf-8');
 
-    this.pythonWorkerReadline = readline.createInterface({
-      input: this.pythonWorker.stdout,
-      crlfDelay: Infinity
-    });
-    this.pythonWorkerReadline.on('line', (line) => {
-      const trimmed = line.trim();
-      if (trimmed) {
-        this.handleWorkerMessage(trimmed);
-      }
-    });
+    // worker 与 Node 读取同一个 WHISPER_WIRE 环境变量：msgpack 为长度前缀帧，默认每行一个 JSON
+    if (process.env.WHISPER_WIRE === 'msgpack') {
+      const readFrames = createMsgpackFrameReader((message) => this.dispatchWorkerMessage(message));
+      this.pythonWorker.stdout.on('data', (chunk: Buffer) => {
+        try {
+          readFrames(chunk);
+        } catch (error) {
+          this.handleInvalidWorkerMessage(error);
+        }
+      });
+    } else {
+      this.pythonWorker.stdout.setEncoding('utf-8');
+      this.pythonWorkerReadline = readline.createInterface({
+        input: this.pythonWorker.stdout,
+        crlfDelay: Infinity
+      });
+      this.pythonWorkerReadline.on('line', (line) => {
+        const trimmed = line.trim();
+        if (trimmed) {
+          this.handleWorkerMessage(trimmed);
+        }
+      });
+    }
 
     this.pythonWorker.stderr.on('data', (data) => {
       const text = data.toString().trim();
@@ -603,6 +637,13 @@ class QueueService {
 
     this.pythonWorker.on('close', (code) => {
       logger.error({ exitCode: code }, 'Worker exited');
+      // 已被取消并重新拉起新 worker 时，旧进程的退出不影响新进程状态
+      if (this.pythonWorker && this.pythonWorker !== worker) return;
+      if (this.workerReadyWaiter) {
+        this.workerReadyWaiter.reject(new Error(`Worker exited with code ${code}`));
+        this.workerReadyWaiter = null;
+      }
+      this.pythonWorkerReady = null;
       if (this.pendingWorkerRequest) {
         this.pendingWorkerRequest.reject(new Error(`Worker exited with code ${code}`));
         this.pendingWorkerRequest = null;
@@ -616,11 +657,18 @@ class QueueService {
 
     this.pythonWorker.on('error', (err) => {
       logger.error({ err }, 'Worker process error');
+      if (this.workerReadyWaiter) {
+        this.workerReadyWaiter.reject(err);
+        this.workerReadyWaiter = null;
+      }
       if (this.pendingWorkerRequest) {
         this.pendingWorkerRequest.reject(err);
         this.pendingWorkerRequest = null;
       }
     });
+
+    this.pythonWorker.stdin.write(JSON.stringify({ type: 'ping', id: ++this.workerRequestId }) + '\n');
+    return this.pythonWorkerReady;
   }
 
   private flushSegmentBuffer(force = false) {
@@ -655,13 +703,21 @@ class QueueService {
    * @param duration 音频总时长(秒)，用于 worker 计算进度
    * @param taskId 当前任务 id，用于进度写库
    */
-  private runPythonWorker(
+  private async runPythonWorker(
     audioPath: string,
     duration: number,
     taskId: string,
     options?: WorkerOptions
   ): Promise<any> {
-    this.ensurePythonWorker();
+    try {
+      await this.ensurePythonWorker();
+    } catch (error) {
+      // 等待模型加载期间被取消（worker 被 kill）
+      if (this.cancelledTaskIds.has(taskId)) {
+        throw new Error('Task cancelled');
+      }
+      throw error;
+    }
 
     return new Promise((resolve, reject) => {
       if (!this.pythonWorker || !this.pythonWorker.stdin.writable) {
@@ -674,9 +730,10 @@ class QueueService {
 
       this.progressThrottleLastPct = 0;
       this.progressThrottleLastTs = 0;
-      this.pendingWorkerRequest = { resolve, reject, taskId };
+      const requestId = ++this.workerRequestId;
+      this.pendingWorkerRequest = { resolve, reject, taskId, requestId };
       const payloadObj: Record<string, unknown> = {
-        id: ++this.workerRequestId,
+        id: requestId,
         audio_file: audioPath,
         duration: duration
       };
@@ -689,6 +746,9 @@ class QueueService {
       if (options?.compression_ratio_threshold !== undefined) {
         payloadObj.compression_ratio_threshold = options.compression_ratio_threshold;
       }
+      if (options?.no_speech_threshold !== undefined) {
+        payloadObj.no_speech_threshold = options.no_speech_threshold;
+      }
       const payload = JSON.stringify(payloadObj);
       this.pythonWorker.stdin.write(payload + '\n');
     });
@@ -699,14 +759,44 @@ class QueueService {
     try {
       message = JSON.parse(line);
     } catch (error) {
-      logger.error({ line, err: error }, 'Failed to parse worker message');
-      if (this.pendingWorkerRequest) {
-        this.pendingWorkerRequest.reject(new Error('Invalid response from worker'));
-        this.pendingWorkerRequest = null;
+      logger.error({ line }, 'Failed to parse worker message');
+      this.handleInvalidWorkerMessage(error);
+      return;
+    }
+    this.dispatchWorkerMessage(message);
+  }
+
+  private handleInvalidWorkerMessage(error: unknown) {
+    logger.error({ err: error }, 'Invalid worker message');
+    if (this.pendingWorkerRequest) {
+      this.pendingWorkerRequest.reject(new Error('Invalid response from worker'));
+      this.pendingWorkerRequest = null;
+    }
+  }
+
+  private dispatchWorkerMessage(message: any) {
+    if (message.type === 'pong') {
+      if (this.workerReadyWaiter) {
+        logger.info('Worker model loaded, ready for tasks');
+        this.workerReadyWaiter.resolve();
+        this.workerReadyWaiter = null;
       }
       return;
     }
 
+    if (message.error && this.workerReadyWaiter && !this.pendingWorkerRequest) {
+      // 模型加载失败：worker 输出错误后退出
+      this.workerReadyWaiter.reject(new Error(message.error));
+      this.workerReadyWaiter = null;
+      return;
+    }
+
+    // worker 可并发处理多个请求，消息按 id 归属；不属于当前请求的（如已取消请求的残留输出）直接丢弃
+    if (message.id != null && this.pendingWorkerRequest && message.id !== this.pendingWorkerRequest.requestId) {
+      logger.debug({ id: message.id, type: message.type }, 'Ignoring worker message for stale request');
+      return;
+    }
+
     if (message.type === 'progress') {
       if (this.pendingWorkerRequest && message.progress_pct != null) {
         this.updateTranscriptionProgressThrottled(this.pendingWorkerRequest.taskId, Number(message.progress_pct));
@@ -715,6 +805,10 @@ class QueueService {
     }
 
     if (message.type === 'segment') {
+      // 进度随 segment 一起下发（progress_pct 可能缺省）
+      if (this.pendingWorkerRequest && message.progress_pct != null) {
+        this.updateTranscriptionProgressThrottled(this.pendingWorkerRequest.taskId, Number(message.progress_pct));
+      }
       if (!this.pendingWorkerRequest || !this.currentTranscriptionId || !this.currentTranscriptionRowId) {
         return;
       }
@@ -89,13 +89,13 @@ export class DependencyChecker {
   }
 
   /**
-   * 检查 Python 依赖（faster-whisper）
+   * 检查 Python 依赖（faster-whisper、orjson、soundfile）
    */
   private static async checkPythonDependencies(): Promise<CheckResult> {
     return new Promise((resolve) => {
       const pythonPath = getPythonPath();
 
-      const process = spawn(pythonPath, ['-c', 'import faster_whisper; print("OK")']);
+      const process = spawn(pythonPath, ['-c', 'import faster_whisper, orjson, soundfile; print("OK")']);
       let output = '';
       let errorOutput = '';
 
@@ -113,13 +113,13 @@ export class DependencyChecker {
           resolve({
             name: 'Python Dependencies',
             status: 'ok',
-            message: `faster-whisper is installed (using: ${pythonPath})`
+            message: `faster-whisper, orjson and soundfile are installed (using: ${pythonPath})`
           });
         } else {
           // 提取错误信息的关键部分
-          let errorMsg = 'faster-whisper is not installed';
+          let errorMsg = 'faster-whisper, orjson or soundfile is not installed';
           if (errorOutput.includes('ModuleNotFoundError') || errorOutput.includes('No module named')) {
-            errorMsg = 'faster-whisper is not installed in this Python environment';
+            errorMsg = 'faster-whisper, orjson or soundfile is not installed in this Python environment';
           }
 
           // 检查是否是虚拟环境路径问题
@@ -129,7 +129,7 @@ export class DependencyChecker {
 
           // 如果路径中有空格，需要用引号包裹
           const quotedPythonPath = pythonPath.includes(' ') ? `"${pythonPath}"` : pythonPath;
-          let installHint = `Run: ${quotedPythonPath} -m pip install faster-whisper`;
+          let installHint = `Run: ${quotedPythonPath} -m pip install faster-whisper orjson soundfile`;
           if (venvExists && pythonPath !== venvPython) {
             const quotedVenvPath = venvPython.includes(' ') ? `"${venvPython}"` : venvPython;
             installHint += `\n   Note: Virtual environment found at ${quotedVenvPath}, but using ${quotedPythonPath}. Consider setting PYTHON_PATH in .env`;
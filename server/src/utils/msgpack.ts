@@ -0,0 +1,114 @@
+/**
+ * 精简 MessagePack 解码器，仅用于解析 Python Worker 在 WHISPER_WIRE=msgpack 时输出的消息。
+ * 支持 nil/bool/int/float/str/bin/array/map，不支持 ext 类型。
+ */
+
+class Reader {
+  private offset = 0;
+
+  constructor(private readonly buf: Buffer) {}
+
+  read(): unknown {
+    const byte = this.buf.readUInt8(this.offset++);
+
+    if (byte <= 0x7f) return byte; // positive fixint
+    if (byte >= 0xe0) return byte - 0x100; // negative fixint
+    if ((byte & 0xf0) === 0x80) return this.readMap(byte & 0x0f);
+    if ((byte & 0xf0) === 0x90) return this.readArray(byte & 0x0f);
+    if ((byte & 0xe0) === 0xa0) return this.readStr(byte & 0x1f);
+
+    switch (byte) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return this.readBin(this.readUInt(1));
+      case 0xc5: return this.readBin(this.readUInt(2));
+      case 0xc6: return this.readBin(this.readUInt(4));
+      case 0xca: return this.take(4).readFloatBE(0);
+      case 0xcb: return this.take(8).readDoubleBE(0);
+      case 0xcc: return this.readUInt(1);
+      case 0xcd: return this.readUInt(2);
+      case 0xce: return this.readUInt(4);
+      case 0xcf: return Number(this.take(8).readBigUInt64BE(0));
+      case 0xd0: return this.take(1).readInt8(0);
+      case 0xd1: return this.take(2).readInt16BE(0);
+      case 0xd2: return this.take(4).readInt32BE(0);
+      case 0xd3: return Number(this.take(8).readBigInt64BE(0));
+      case 0xd9: return this.readStr(this.readUInt(1));
+      case 0xda: return this.readStr(this.readUInt(2));
+      case 0xdb: return this.readStr(this.readUInt(4));
+      case 0xdc: return this.readArray(this.readUInt(2));
+      case 0xdd: return this.readArray(this.readUInt(4));
+      case 0xde: return this.readMap(this.readUInt(2));
+      case 0xdf: return this.readMap(this.readUInt(4));
+      default:
+        throw new Error(`Unsupported msgpack type byte 0x${byte.toString(16)}`);
+    }
+  }
+
+  get done() {
+    return this.offset >= this.buf.length;
+  }
+
+  private take(length: number) {
+    if (this.offset + length > this.buf.length) {
+      throw new Error('Unexpected end of msgpack data');
+    }
+    const slice = this.buf.subarray(this.offset, this.offset + length);
+    this.offset += length;
+    return slice;
+  }
+
+  private readUInt(bytes: 1 | 2 | 4) {
+    return this.take(bytes).readUIntBE(0, bytes);
+  }
+
+  private readStr(length: number) {
+    return this.take(length).toString('utf-8');
+  }
+
+  private readBin(length: number) {
+    return Buffer.from(this.take(length));
+  }
+
+  private readArray(length: number) {
+    const arr: unknown[] = [];
+    for (let i = 0; i < length; i++) arr.push(this.read());
+    return arr;
+  }
+
+  private readMap(length: number) {
+    const obj: Record<string, unknown> = {};
+    for (let i = 0; i < length; i++) {
+      const key = this.read();
+      obj[String(key)] = this.read();
+    }
+    return obj;
+  }
+}
+
+export const decodeMsgpack = (buf: Buffer): unknown => {
+  const reader = new Reader(buf);
+  const value = reader.read();
+  if (!reader.done) {
+    throw new Error('Trailing bytes after msgpack value');
+  }
+  return value;
+};
+
+/**
+ * 按「4 字节大端长度 + msgpack 负载」拆帧，每凑齐一帧回调一次
+ */
+export const createMsgpackFrameReader = (onMessage: (message: unknown) => void) => {
+  let pending = Buffer.alloc(0);
+  return (chunk: Buffer) => {
+    pending = pending.length ? Buffer.concat([pending, chunk]) : chunk;
+    while (pending.length >= 4) {
+      const length = pending.readUInt32BE(0);
+      if (pending.length < 4 + length) break;
+      const frame = pending.subarray(4, 4 + length);
+      pending = pending.subarray(4 + length);
+      onMessage(decodeMsgpack(frame));
+    }
+  };
+};
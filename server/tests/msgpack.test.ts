@@ -0,0 +1,65 @@
+import { describe, it, expect } from 'vitest';
+import { decodeMsgpack, createMsgpackFrameReader } from '../src/utils/msgpack';
+
+const fixstr = (s: string) => {
+  const bytes = Buffer.from(s, 'utf-8');
+  return Buffer.concat([Buffer.from([0xa0 | bytes.length]), bytes]);
+};
+
+const float64 = (n: number) => {
+  const buf = Buffer.alloc(9);
+  buf.writeUInt8(0xcb, 0);
+  buf.writeDoubleBE(n, 1);
+  return buf;
+};
+
+// {"type": "segment", "id": 1, "data": {"start": 1.5, "end": 2, "text": "中"}}
+const segmentMessage = Buffer.concat([
+  Buffer.from([0x83]),
+  fixstr('type'), fixstr('segment'),
+  fixstr('id'), Buffer.from([0x01]),
+  fixstr('data'), Buffer.from([0x83]),
+  fixstr('start'), float64(1.5),
+  fixstr('end'), Buffer.from([0x02]),
+  fixstr('text'), fixstr('中')
+]);
+
+const frame = (body: Buffer) => {
+  const header = Buffer.alloc(4);
+  header.writeUInt32BE(body.length, 0);
+  return Buffer.concat([header, body]);
+};
+
+describe('decodeMsgpack', () => {
+  it('decodes a worker segment message', () => {
+    expect(decodeMsgpack(segmentMessage)).toEqual({
+      type: 'segment',
+      id: 1,
+      data: { start: 1.5, end: 2, text: '中' }
+    });
+  });
+
+  it('decodes nil, booleans and negative ints', () => {
+    expect(decodeMsgpack(Buffer.from([0x93, 0xc0, 0xc3, 0xff]))).toEqual([null, true, -1]);
+  });
+
+  it('throws on truncated input', () => {
+    expect(() => decodeMsgpack(segmentMessage.subarray(0, 10))).toThrow();
+  });
+});
+
+describe('createMsgpackFrameReader', () => {
+  it('emits messages only once a full frame has arrived', () => {
+    const messages: unknown[] = [];
+    const read = createMsgpackFrameReader((m) => messages.push(m));
+    const data = Buffer.concat([frame(segmentMessage), frame(Buffer.from([0xc2]))]);
+
+    read(data.subarray(0, 7));
+    expect(messages).toHaveLength(0);
+    read(data.subarray(7));
+    expect(messages).toEqual([
+      { type: 'segment', id: 1, data: { start: 1.5, end: 2, text: '中' } },
+      false
+    ]);
+  });
+});
@@ -0,0 +1,76 @@
+import os
+
+# 可选的 Transformers 转写后端：fp16 + Flash Attention 2 + 批量推理（30s 分块，batch_size=24）。
+# 在 A100/L40S 等显卡上长音频比 faster-whisper 单流逐段解码快得多。
+# 通过环境变量 ASR_BACKEND=transformers 启用；权重为 HF 格式（默认 openai/whisper-large-v3），
+# 与 models/large-v3 下的 CTranslate2 模型不同。
+HF_MODEL_ID = os.environ.get("HF_WHISPER_MODEL", "openai/whisper-large-v3")
+
+_PIPELINE = None
+
+def use_transformers_backend():
+    return os.environ.get("ASR_BACKEND") == "transformers"
+
+def _build_asr_pipeline():
+    """加载一次 HF Whisper pipeline 并缓存在模块级变量中"""
+    global _PIPELINE
+    if _PIPELINE is not None:
+        return _PIPELINE
+
+    import torch
+    from transformers import pipeline
+
+    try:
+        import flash_attn  # noqa: F401
+        attn_implementation = "flash_attention_2"
+    except ImportError:
+        # 未安装 flash-attn 时退回 PyTorch SDPA 融合注意力
+        attn_implementation = "sdpa"
+
+    print(f"Loading HF pipeline ({HF_MODEL_ID}, attn={attn_implementation})...")
+    _PIPELINE = pipeline(
+        "automatic-speech-recognition",
+        HF_MODEL_ID,
+        torch_dtype=torch.float16,
+        model_kwargs={"attn_implementation": attn_implementation},
+        device="cuda:0",
+    )
+    return _PIPELINE
+
+def _audio_duration(file_path):
+    """读取音频时长(秒)，用 faster-whisper 自带的 PyAV 只读容器头；失败返回 None"""
+    try:
+        import av
+        with av.open(file_path) as container:
+            if container.duration:
+                return container.duration / av.time_base
+    except Exception:
+        pass
+    return None
+
+def transcribe_segments(file_path, language):
+    """转写并返回与 faster-whisper 流程一致的片段列表：[{"start", "end", "text"}]"""
+    pipe = _build_asr_pipeline()
+    result = pipe(
+        file_path,
+        chunk_length_s=30,
+        batch_size=24,
+        return_timestamps=True,
+        generate_kwargs={"language": language, "task": "transcribe"},
+    )
+
+    segment_list = []
+    for chunk in result.get("chunks", []):
+        start, end = chunk["timestamp"]
+        # 最后一个分块可能没有结束时间：取 start + 30s，且不超过音频时长
+        if end is None:
+            end = start + 30
+            duration = _audio_duration(file_path)
+            if duration:
+                end = max(start, min(end, duration))
+        segment_list.append({
+            "start": start,
+            "end": end,
+            "text": chunk["text"].strip()
+        })
+    return segment_list
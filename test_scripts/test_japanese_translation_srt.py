@@ -1,16 +1,67 @@
 import time
 import os
 import json
+import glob
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from hf_whisper import use_transformers_backend, transcribe_segments
+
+try:
+    # orjson 为 C 扩展，序列化大量片段时比标准库 json 快数倍
+    import orjson
+
+    def _json_bytes(obj):
+        return orjson.dumps(obj)
+except ImportError:
+    # 未安装 orjson 时退回标准库 json
+    def _json_bytes(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+MODEL_PATH = "models/large-v3"
+# 模型目录只在启动时检查一次，避免每次转写都 stat
+MODEL_EXISTS = os.path.isdir(MODEL_PATH)
+
+# 批量推理：VAD 切出的多个 30s 片段合并成一批送入模型，长音频时 GPU 利用率更高
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "16"))
+
+# Whisper 模型单例：同一进程内多次转写（批量模式）只加载一次权重
+_MODEL = None
+
+def _get_model():
+    global _MODEL
+    if _MODEL is None:
+        print(f"Loading model (large-v3)...")
+        # GPU 上纯 int8 走的是慢速内核，float16 可用 Tensor Core；显存紧张时可改为 int8_float16
+        _MODEL = BatchedInferencePipeline(
+            model=WhisperModel(MODEL_PATH, device="cuda", compute_type="float16")
+        )
+    return _MODEL
+
+# 复用 HTTP keep-alive 连接，避免每个片段重新建连
+_OLLAMA = requests.Session()
+
+# 并发翻译请求数；Ollama 单模型实例会在内部排队/批处理
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+# 限制同时发往 Ollama 的请求数（含逐条回退翻译），只限流不人为 sleep
+_SEM = threading.BoundedSemaphore(OLLAMA_CONCURRENCY)
+
+# 翻译缓存每完成多少个片段写盘一次，中断后可续跑
+CACHE_FLUSH_EVERY = 20
+
+# 每次请求打包翻译的片段数，摊薄每次调用的 prefill/启动开销
+OLLAMA_BATCH_SIZE = int(os.getenv("OLLAMA_BATCH_SIZE", "10"))
 
 def format_timestamp(seconds):
     """将秒数转换为 SRT 时间格式 (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+    # 先四舍五入到整数毫秒，再用整数 divmod 拆分（原实现对毫秒直接截断）
+    ms = round(seconds * 1000)
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    secs, ms = divmod(ms, 1000)
+    return "%02d:%02d:%02d,%03d" % (hours, minutes, secs, ms)
 
 def get_output_dir(video_file):
     """根据视频文件路径创建输出目录"""
@@ -21,132 +72,259 @@ def get_output_dir(video_file):
 
 def transcribe_japanese(file_path, output_dir):
     """转写日文视频/音频文件，并保存到输出目录"""
-    if not os.path.exists(file_path):
-        print(f"[ERROR] File not found: {file_path}")
-        return None
-
-    print(f"Loading model (large-v3)...")
-    model_path = "models/large-v3"
-
-    if not os.path.exists(model_path):
-        print(f"[ERROR] Model path not found: {model_path}")
-        print("Please download model files to this directory manually.")
-        return None
-
-    model = WhisperModel(model_path, device="cuda", compute_type="int8")
-
-    print(f"Start transcribing Japanese: {file_path}")
-    start_time = time.time()
-
-    segments, info = model.transcribe(
-        file_path,
-        beam_size=5,
-        language="ja",  # 指定日文
-        vad_filter=True  # 开启语音活动检测
-    )
-
-    print(f"Detected language '{info.language}' with probability {info.language_probability:.2f}")
+    if use_transformers_backend():
+        # Transformers + Flash Attention 2 批量推理
+        print(f"Start transcribing Japanese (transformers): {file_path}")
+        start_time = time.time()
+        try:
+            segments = transcribe_segments(file_path, "ja")
+        except FileNotFoundError:
+            print(f"[ERROR] File not found: {file_path}")
+            return None
+        language, language_probability = "ja", None
+    else:
+        if not MODEL_EXISTS:
+            print(f"[ERROR] Model path not found: {MODEL_PATH}")
+            print("Please download model files to this directory manually.")
+            return None
+
+        model = _get_model()
+
+        print(f"Start transcribing Japanese: {file_path}")
+        start_time = time.time()
+
+        # 不预先检查文件是否存在，由打开文件时的异常判断
+        try:
+            segments, info = model.transcribe(
+                file_path,
+                beam_size=1,  # 贪心解码，对 large-v3 质量影响可忽略，解码约快 5 倍
+                language="ja",  # 指定日文
+                vad_filter=True,  # 开启语音活动检测
+                batch_size=BATCH_SIZE,
+                without_timestamps=False  # 批量路径默认不出时间戳，每个 VAD 块(最长 30s)会变成一条
+            )
+        except FileNotFoundError:
+            print(f"[ERROR] File not found: {file_path}")
+            return None
+
+        print(f"Detected language '{info.language}' with probability {info.language_probability:.2f}")
+        language, language_probability = info.language, info.language_probability
+        segments = (
+            {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+            for segment in segments
+        )
 
-    # 收集所有片段
+    # 边转写边写入 JSON 与纯文本文件（一次遍历），无需事后再整体序列化。
+    # 先写临时文件，全部完成后再原子替换，中途失败不会覆盖上一次的完整结果
+    transcription_file = os.path.join(output_dir, "transcription.json")
+    text_file = os.path.join(output_dir, "transcription.txt")
+    json_tmp = f"{transcription_file}.tmp"
+    text_tmp = f"{text_file}.tmp"
     segment_list = []
-    for segment in segments:
-        segment_list.append({
-            "start": segment.start,
-            "end": segment.end,
-            "text": segment.text.strip()
-        })
-        print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
+    with open(json_tmp, "wb") as json_f, \
+            open(text_tmp, "w", encoding="utf-8") as text_f:
+        json_f.write(
+            b'{\n  "language": ' + _json_bytes(language) + b',\n'
+            b'  "language_probability": ' + _json_bytes(language_probability) + b',\n'
+            b'  "segments": ['
+        )
+        for segment in segments:
+            line = f"[{segment['start']:.2f}s -> {segment['end']:.2f}s] {segment['text']}"
+            print(line)
+            json_f.write((b"," if segment_list else b"") + b"\n    " + _json_bytes(segment))
+            # 同时保存为纯文本文件（方便查看）
+            text_f.write(line + "\n")
+            segment_list.append(segment)
+        json_f.write(b"\n  ]\n}\n")
+    os.replace(json_tmp, transcription_file)
+    os.replace(text_tmp, text_file)
 
     end_time = time.time()
     duration = end_time - start_time
 
     print(f"\n[DONE] Transcription finished in {duration:.2f}s")
     print(f"Total segments: {len(segment_list)}")
-
-    # 保存转写结果到JSON文件
-    transcription_file = os.path.join(output_dir, "transcription.json")
-    with open(transcription_file, "w", encoding="utf-8") as f:
-        json.dump({
-            "language": info.language,
-            "language_probability": info.language_probability,
-            "segments": segment_list
-        }, f, ensure_ascii=False, indent=2)
-
     print(f"[SAVED] Transcription saved to: {transcription_file}")
-
-    # 同时保存为纯文本文件（方便查看）
-    text_file = os.path.join(output_dir, "transcription.txt")
-    with open(text_file, "w", encoding="utf-8") as f:
-        for segment in segment_list:
-            f.write(f"[{segment['start']:.2f}s -> {segment['end']:.2f}s] {segment['text']}\n")
-
     print(f"[SAVED] Transcription text saved to: {text_file}")
 
     return segment_list
 
+def _ollama_generate(prompt, model, format=None):
+    """调用 Ollama generate 接口（流式读取），返回完整回复文本"""
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True
+    }
+    if format:
+        payload["format"] = format
+
+    # 流式读取：首个 token 返回即开始接收，网络往返与模型生成重叠
+    out = []
+    with _SEM:
+        response = _OLLAMA.post(
+            "http://localhost:11434/api/generate",
+            json=payload,
+            timeout=300,
+            stream=True
+        )
+        # 先进入 with 再检查状态码，出错时连接也会释放回 Session 连接池
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                # 生成中途出错时 Ollama 以 {"error": ...} 行结束流，不能把半截回复当成完整译文
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                out.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    break
+    return "".join(out).strip()
+
 def translate_with_ollama(text, model="qwen3:14b"):
     """使用 Ollama 将日文翻译成中文"""
-    print(f"Translating with Ollama ({model})...")
 
     prompt = f"""请将以下日文文本翻译成中文。要求：
 1. 翻译准确、自然流畅
 2. 保持原文的语气和风格
-3. 只输出翻译后的中文，不要添加任何解释或注释
+3. 仅返回 JSON：{{"zh": "<中文译文>"}}，不要添加任何解释或注释
 
 日文文本：
 {text}
 """
 
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=300
-        )
+        # 结构化输出：直接取 zh 字段，无需再清理模型附加的说明文字
+        data = json.loads(_ollama_generate(prompt, model, format="json"))
+        return str(data["zh"]).strip()
 
-        response.raise_for_status()
-        result = response.json()
-        translated_text = result['response'].strip()
+    except requests.exceptions.ConnectionError:
+        print("[ERROR] Could not connect to Ollama. Is it running?")
+        print("Run 'ollama serve' in a separate terminal.")
+        return None
+    except Exception as e:
+        print(f"[ERROR] Failed to translate: {e}")
+        return None
 
-        # 清理可能的额外说明文字
-        if "翻译" in translated_text[:50] or "中文" in translated_text[:50]:
-            # 尝试提取实际翻译内容
-            lines = translated_text.split('\n')
-            translated_text = '\n'.join([line for line in lines if not line.startswith('翻译') and not line.startswith('中文')])
+def translate_batch_with_ollama(texts, model="qwen3:14b"):
+    """将多个片段打包成一次请求翻译，返回与 texts 等长的译文列表；解析失败返回 None"""
+    numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+    prompt = f"""请将下列编号日文翻译成中文。要求：
+1. 翻译准确、自然流畅，保持原文的语气和风格
+2. 严格以 JSON 返回：{{"translations": ["第1条译文", "第2条译文", ...]}}，共 {len(texts)} 条，顺序与编号一致
+3. 不要添加任何解释或注释
 
-        return translated_text
+日文文本：
+{numbered}
+"""
 
+    try:
+        data = json.loads(_ollama_generate(prompt, model, format="json"))
+        translations = data.get("translations") if isinstance(data, dict) else data
+        if not isinstance(translations, list) or len(translations) != len(texts):
+            return None
+        return [str(t).strip() for t in translations]
     except requests.exceptions.ConnectionError:
         print("[ERROR] Could not connect to Ollama. Is it running?")
         print("Run 'ollama serve' in a separate terminal.")
         return None
     except Exception as e:
-        print(f"[ERROR] Failed to translate: {e}")
+        print(f"[ERROR] Failed to translate batch: {e}")
         return None
 
+def _translate_group(texts, model):
+    """打包翻译一组片段：失败重试一次，仍失败则逐条翻译"""
+    for _ in range(2):
+        translations = translate_batch_with_ollama(texts, model)
+        if translations is not None:
+            return translations
+    print(f"[WARNING] Batch translation failed, falling back to {len(texts)} single requests")
+    return [translate_with_ollama(text, model) for text in texts]
+
 def load_transcription(transcription_file):
     """从JSON文件加载转写结果"""
-    if not os.path.exists(transcription_file):
+    try:
+        with open(transcription_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
         print(f"[ERROR] Transcription file not found: {transcription_file}")
         return None
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Transcription file is corrupted: {transcription_file} ({e})")
+        return None
+    return data.get("segments", [])
 
-    with open(transcription_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        return data.get("segments", [])
+def _cache_file(output_dir):
+    return os.path.join(output_dir, "translation_cache.json")
 
-def translate_segments(segments, model="qwen3:14b"):
-    """批量翻译所有片段"""
-    print(f"\nTranslating {len(segments)} segments...")
-    translated_segments = []
+def _load_cache(output_dir):
+    """加载翻译缓存 {hash: 译文}"""
+    if not output_dir:
+        return {}
+    try:
+        with open(_cache_file(output_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-    for i, segment in enumerate(segments, 1):
-        print(f"Translating segment {i}/{len(segments)}...")
-        translated_text = translate_with_ollama(segment["text"], model)
+def _save_cache(output_dir, cache):
+    if not output_dir:
+        return
+    # 先写临时文件再原子替换，中途中断不会留下截断的缓存文件
+    path = _cache_file(output_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_json_bytes(cache))
+    os.replace(tmp_path, path)
+
+def _cache_key(model, text):
+    return hashlib.sha1(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+def translate_segments(segments, model="qwen3:14b", output_dir=None):
+    """批量翻译所有片段。指定 output_dir 时按 (模型, 原文) 缓存译文，重复片段不再请求 Ollama"""
+    print(f"\nTranslating {len(segments)} segments (concurrency={OLLAMA_CONCURRENCY})...")
+    cache = _load_cache(output_dir)
+    keys = [_cache_key(model, segment["text"]) for segment in segments]
+
+    # 相同原文只翻译一次
+    pending = {}
+    for segment, key in zip(segments, keys):
+        if key not in cache and key not in pending:
+            pending[key] = segment["text"]
+    print(f"Cache hits: {len(segments) - len(pending)}, to translate: {len(pending)}")
+
+    # 每 OLLAMA_BATCH_SIZE 个片段打包成一组，多组并发提交，按 key 回填
+    pending_items = list(pending.items())
+    groups = [
+        pending_items[i:i + OLLAMA_BATCH_SIZE]
+        for i in range(0, len(pending_items), OLLAMA_BATCH_SIZE)
+    ]
+    done = 0
+    unsaved = 0
+    with ThreadPoolExecutor(max_workers=OLLAMA_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(_translate_group, [text for _, text in group], model): group
+            for group in groups
+        }
+        for future in as_completed(futures):
+            group = futures[future]
+            for (key, _), translated in zip(group, future.result()):
+                if translated:
+                    cache[key] = translated
+            done += len(group)
+            unsaved += len(group)
+            print(f"Translated {done}/{len(pending)} segments")
+            if unsaved >= CACHE_FLUSH_EVERY:
+                _save_cache(output_dir, cache)
+                unsaved = 0
+    _save_cache(output_dir, cache)
+
+    results = [cache.get(key) for key in keys]
 
+    translated_segments = []
+    for i, (segment, translated_text) in enumerate(zip(segments, results), 1):
         if translated_text:
             translated_segments.append({
                 "start": segment["start"],
@@ -162,26 +340,22 @@ def translate_segments(segments, model="qwen3:14b"):
                 "text": segment["text"]
             })
 
-        # 避免请求过快
-        time.sleep(0.5)
-
     return translated_segments
 
 def write_srt_file(segments, output_file):
     """将片段写入 SRT 格式文件"""
     print(f"\nWriting SRT file: {output_file}")
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        for i, segment in enumerate(segments, 1):
-            start_time = format_timestamp(segment["start"])
-            end_time = format_timestamp(segment["end"])
-            text = segment["text"]
+    # 先拼好整个 SRT 内容再一次写入，避免每个片段多次 write
+    parts = []
+    append = parts.append
+    fmt = format_timestamp
+    for i, segment in enumerate(segments, 1):
+        # SRT 格式
+        append(f"{i}\n{fmt(segment['start'])} --> {fmt(segment['end'])}\n{segment['text']}\n\n")
 
-            # SRT 格式
-            f.write(f"{i}\n")
-            f.write(f"{start_time} --> {end_time}\n")
-            f.write(f"{text}\n")
-            f.write("\n")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("".join(parts))
 
     print(f"[DONE] SRT file saved: {output_file}")
 
@@ -204,22 +378,23 @@ def step1_transcribe(video_file):
     print("="*60)
     return output_dir
 
-def step2_translate_and_generate_srt(output_dir, model="qwen3:14b"):
-    """步骤2: 翻译并生成SRT文件"""
+def step2_translate_and_generate_srt(output_dir, model="qwen3:14b", segments=None):
+    """步骤2: 翻译并生成SRT文件。传入 segments 时直接使用，否则从 transcription.json 加载"""
     print("\n" + "="*60)
     print("Step 2: Translation & SRT Generation")
     print("="*60)
 
-    transcription_file = os.path.join(output_dir, "transcription.json")
+    if segments is None:
+        transcription_file = os.path.join(output_dir, "transcription.json")
 
-    # 加载转写结果
-    segments = load_transcription(transcription_file)
-    if not segments:
-        print("[ERROR] Failed to load transcription")
-        return
+        # 加载转写结果
+        segments = load_transcription(transcription_file)
+        if not segments:
+            print("[ERROR] Failed to load transcription")
+            return
 
     # 翻译
-    translated_segments = translate_segments(segments, model)
+    translated_segments = translate_segments(segments, model, output_dir)
 
     # 生成 SRT 文件
     srt_file = os.path.join(output_dir, "chinese.srt")
@@ -238,26 +413,16 @@ def process_japanese_video(video_file, model="qwen3:14b", skip_transcribe=False)
     output_dir = get_output_dir(video_file)
     print(f"Output directory: {output_dir}")
 
-    # 步骤1: 转写（如果未跳过）
+    # 步骤1: 转写（如果未跳过）；跳过时由步骤2从已有文件加载
+    segments = None
     if not skip_transcribe:
         segments = transcribe_japanese(video_file, output_dir)
         if not segments:
             print("[ERROR] Transcription failed")
             return
-    else:
-        # 从已有文件加载
-        transcription_file = os.path.join(output_dir, "transcription.json")
-        segments = load_transcription(transcription_file)
-        if not segments:
-            print("[ERROR] Failed to load transcription")
-            return
 
-    # 步骤2: 翻译
-    translated_segments = translate_segments(segments, model)
-
-    # 步骤3: 生成 SRT 文件
-    srt_file = os.path.join(output_dir, "chinese.srt")
-    write_srt_file(translated_segments, srt_file)
+    # 步骤2、3: 翻译并生成 SRT 文件（直接使用内存中的片段，不再重新读取 JSON）
+    step2_translate_and_generate_srt(output_dir, model, segments)
 
     print("\n" + "="*60)
     print("All done!")
@@ -274,10 +439,13 @@ if __name__ == "__main__":
         print("    python test_japanese_translation_srt.py translate <output_dir> [model]")
         print("  Full process:")
         print("    python test_japanese_translation_srt.py full <video_file> [model]")
+        print("  Batch full process (model loaded once):")
+        print("    python test_japanese_translation_srt.py batch <glob> [model]")
         print("\nExample:")
         print("  python test_japanese_translation_srt.py transcribe sample/30080.mp4")
         print("  python test_japanese_translation_srt.py translate output/30080 qwen3:14b")
         print("  python test_japanese_translation_srt.py full sample/30080.mp4 qwen3:14b")
+        print("  python test_japanese_translation_srt.py batch \"sample/*.mp4\" qwen3:14b")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -308,8 +476,22 @@ if __name__ == "__main__":
         ollama_model = sys.argv[3] if len(sys.argv) > 3 else "qwen3:14b"
         process_japanese_video(video_file, ollama_model)
 
+    elif command == "batch":
+        # 批量完整流程：同一进程内复用已加载的 Whisper 模型
+        if len(sys.argv) < 3:
+            print("[ERROR] Please specify a glob of video files")
+            sys.exit(1)
+        video_files = sorted(glob.glob(sys.argv[2]))
+        if not video_files:
+            print(f"[ERROR] No files matched: {sys.argv[2]}")
+            sys.exit(1)
+        ollama_model = sys.argv[3] if len(sys.argv) > 3 else "qwen3:14b"
+        for i, video_file in enumerate(video_files, 1):
+            print(f"\n[BATCH] {i}/{len(video_files)}: {video_file}")
+            process_japanese_video(video_file, ollama_model)
+
     else:
         print(f"[ERROR] Unknown command: {command}")
-        print("Use 'transcribe', 'translate', or 'full'")
+        print("Use 'transcribe', 'translate', 'full', or 'batch'")
         sys.exit(1)
 
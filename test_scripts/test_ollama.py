@@ -4,53 +4,158 @@ import json
 import sys
 import os
 import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+# 复用 HTTP keep-alive 连接，分块并发请求时不重复建连
+_OLLAMA = requests.Session()
+
+# 中文约 3 字符/token；单次 Prompt 的正文上限约 6k token，超出则分块总结再合并
+CHARS_PER_TOKEN = 3
+MAX_PROMPT_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "6000"))
+CHUNK_CHARS = MAX_PROMPT_TOKENS * CHARS_PER_TOKEN
+# 相邻分块重叠的字符数，避免句子被切断后丢失上下文
+CHUNK_OVERLAP_CHARS = 300
+READ_BLOCK_CHARS = 8192
+OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "4"))
+
+SUMMARY_REQUIREMENTS = """要求：
+1. 提取核心议题
+2. 列出关键结论
+3. 整理待办事项（如果有）
+4. 保持简洁专业"""
+
+def _read_chunks(file_path):
+    """按 8KB 块增量读取文本，每凑满 CHUNK_CHARS 产出一个分块（相邻分块有少量重叠）"""
+    buf = ""
+    carried = 0
+    with open(file_path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(READ_BLOCK_CHARS)
+            if not block:
+                break
+            buf += block
+            while len(buf) >= CHUNK_CHARS:
+                yield buf[:CHUNK_CHARS]
+                buf = buf[CHUNK_CHARS - CHUNK_OVERLAP_CHARS:]
+                carried = CHUNK_OVERLAP_CHARS
+    # 剩余部分只是上一块的重叠内容时不再单独成块
+    if len(buf) > carried and buf.strip():
+        yield buf
+
+def _ollama_generate(prompt, model):
+    response = _OLLAMA.post(
+        "http://localhost:11434/api/generate",
+        json={
+            "model": model,
+            "prompt": prompt,
+            "stream": False  # 这里为了简单，先不使用流式输出
+        },
+        timeout=300  # 5分钟超时，防止长文本处理时间过长
+    )
+    response.raise_for_status()
+    return response.json()['response']
+
+def _summarize_chunk(index, chunk, model):
+    prompt = f"""
+以下是一段会议录音内容的第 {index} 部分，请总结这一部分。
+{SUMMARY_REQUIREMENTS}
+
+内容如下：
+{chunk}
+"""
+    return _ollama_generate(prompt, model)
+
+def _merge_summaries(partials, model):
+    prompt = f"""
+以下是一次会议录音按顺序分段总结的结果，请合并为一份完整的会议总结，去除重复内容。
+{SUMMARY_REQUIREMENTS}
+
+分段总结如下：
+{_join_summaries(partials)}
+"""
+    return _ollama_generate(prompt, model)
+
+def _join_summaries(partials):
+    return "\n\n".join(f"【第 {i} 部分】\n{text}" for i, text in enumerate(partials, 1))
+
+def _group_summaries(partials):
+    """按顺序把分段摘要分组，每组拼接后不超过 CHUNK_CHARS；每组至少 2 条，保证每轮合并后条数减少"""
+    groups = []
+    current = []
+    size = 0
+    for text in partials:
+        if len(current) >= 2 and size + len(text) > CHUNK_CHARS:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(text)
+        size += len(text)
+    if len(current) == 1 and groups:
+        groups[-1].append(current[0])
+    elif current:
+        groups.append(current)
+    return groups
+
+def _map_chunks(chunks, model, pool):
+    """边读边提交分块总结；在途请求不超过 2 * OLLAMA_CONCURRENCY，内存中只保留这些分块"""
+    futures = []
+    pending = 0
+    for index, chunk in enumerate(chunks, 1):
+        if pending >= 2 * OLLAMA_CONCURRENCY:
+            futures[index - 1 - pending].result()
+            pending -= 1
+        futures.append(pool.submit(_summarize_chunk, index, chunk, model))
+        pending += 1
+    return [f.result() for f in futures]
+
+def _reduce_summaries(partials, model, pool):
+    """分组合并分段摘要，直到拼接后的文本不超过 CHUNK_CHARS，再做最终合并"""
+    while len(partials) > 1 and len(_join_summaries(partials)) > CHUNK_CHARS:
+        groups = _group_summaries(partials)
+        print(f"Merging {len(partials)} summaries in {len(groups)} group(s)...")
+        partials = list(pool.map(lambda group: _merge_summaries(group, model), groups))
+    if len(partials) == 1:
+        return partials[0]
+    return _merge_summaries(partials, model)
 
 def summarize_text(file_path, model="qwen3:14b"):
-    if not os.path.exists(file_path):
+    print(f"Reading text from: {file_path}")
+    chunks = _read_chunks(file_path)
+    try:
+        first = next(chunks, None)
+        second = next(chunks, None)
+    except FileNotFoundError:
         print(f"[ERROR] File not found: {file_path}")
         return
 
-    print(f"Reading text from: {file_path}")
-    with open(file_path, "r", encoding="utf-8") as f:
-        text_content = f.read()
-
-    if not text_content.strip():
+    if first is None:
         print("[ERROR] File is empty")
         return
 
-    print(f"Text length: {len(text_content)} chars")
+    print(f"Text is split into chunks of up to {CHUNK_CHARS} chars")
     print(f"Sending to Ollama ({model})...")
 
-    # 构造 Prompt
-    prompt = f"""
+    start_time = time.time()
+
+    try:
+        if second is None:
+            # 短文本：一次请求直接总结
+            prompt = f"""
 请对以下会议录音内容进行总结。
-要求：
-1. 提取核心议题
-2. 列出关键结论
-3. 整理待办事项（如果有）
-4. 保持简洁专业
+{SUMMARY_REQUIREMENTS}
 
 内容如下：
-{text_content}
+{first}
 """
-
-    start_time = time.time()
-
-    try:
-        # 调用 Ollama API
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False  # 这里为了简单，先不使用流式输出
-            },
-            timeout=300  # 5分钟超时，防止长文本处理时间过长
-        )
-
-        response.raise_for_status()
-        result = response.json()
-        summary = result['response']
+            summary = _ollama_generate(prompt, model)
+        else:
+            # 长文本：各分块边读边并发总结（map），再分组合并分块摘要（reduce），每次 Prompt 都不超过上限
+            with ThreadPoolExecutor(max_workers=OLLAMA_CONCURRENCY) as pool:
+                partials = _map_chunks(itertools.chain((first, second), chunks), model, pool)
+                del first, second
+                print(f"Chunk summaries done, merging {len(partials)} summaries...")
+                summary = _reduce_summaries(partials, model, pool)
 
         end_time = time.time()
         duration = end_time - start_time
@@ -1,34 +1,83 @@
 
 import time
 import os
-from faster_whisper import WhisperModel
+import sys
+import glob
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+from hf_whisper import use_transformers_backend, transcribe_segments
+
+# 使用本地 large-v3 模型
+# 请确保模型文件已下载到项目根目录下的 models/large-v3 文件夹
+MODEL_PATH = "models/large-v3"
+# 模型目录只在启动时检查一次，批量转写时不再重复 stat
+MODEL_EXISTS = os.path.isdir(MODEL_PATH)
+
+# 批量推理：VAD 切出的多个 30s 片段合并成一批送入模型，长音频时 GPU 利用率更高
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "16"))
+
+# Whisper 模型单例：同一进程内转写多个文件时只加载一次权重
+_MODEL = None
+
+def _get_model():
+    global _MODEL
+    if _MODEL is None:
+        print(f"Loading model (large-v3)...")
+        # GPU 上纯 int8 走的是慢速内核，float16 可用 Tensor Core；显存紧张时可改为 int8_float16
+        _MODEL = BatchedInferencePipeline(
+            model=WhisperModel(MODEL_PATH, device="cuda", compute_type="float16")
+        )
+    return _MODEL
+
+def transcribe_file_transformers(file_path):
+    """使用 Transformers + Flash Attention 2 批量转写（ASR_BACKEND=transformers）"""
+    print(f"Start transcribing (transformers): {file_path}")
+    start_time = time.time()
 
-def transcribe_file(file_path):
-    if not os.path.exists(file_path):
+    try:
+        segment_list = transcribe_segments(file_path, "zh")
+    except FileNotFoundError:
         print(f"[ERROR] File not found: {file_path}")
         return
 
-    print(f"Loading model (large-v3)...")
-    # 使用本地 large-v3 模型
-    # 请确保模型文件已下载到项目根目录下的 models/large-v3 文件夹
-    model_path = "models/large-v3"
+    output_file = os.path.splitext(file_path)[0] + "_transcription.txt"
+    print(f"Writing results to: {output_file}")
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        for segment in segment_list:
+            print(f"[{segment['start']:.2f}s -> {segment['end']:.2f}s] {segment['text']}")
+            f.write(segment["text"] + "\n")
+
+    print(f"\n[DONE] Transcription finished in {time.time() - start_time:.2f}s")
+    print(f"Total segments: {len(segment_list)}")
+
+def transcribe_file(file_path):
+    if use_transformers_backend():
+        transcribe_file_transformers(file_path)
+        return
 
-    if not os.path.exists(model_path):
-        print(f"[ERROR] Model path not found: {model_path}")
+    if not MODEL_EXISTS:
+        print(f"[ERROR] Model path not found: {MODEL_PATH}")
         print("Please download model files to this directory manually.")
         return
 
-    model = WhisperModel(model_path, device="cuda", compute_type="int8")
+    model = _get_model()
 
     print(f"Start transcribing: {file_path}")
     start_time = time.time()
 
-    segments, info = model.transcribe(
-        file_path,
-        beam_size=5,
-        language="zh",  # 强制指定中文，或者去掉自动检测
-        vad_filter=True # 开启语音活动检测
-    )
+    # 不预先检查文件是否存在，由打开文件时的异常判断
+    try:
+        segments, info = model.transcribe(
+            file_path,
+            beam_size=1,  # 贪心解码，对 large-v3 质量影响可忽略，解码约快 5 倍
+            language="zh",  # 强制指定中文，或者去掉自动检测
+            vad_filter=True, # 开启语音活动检测
+            batch_size=BATCH_SIZE,
+            without_timestamps=False  # 批量路径默认不出时间戳，每个 VAD 块(最长 30s)会变成一条
+        )
+    except FileNotFoundError:
+        print(f"[ERROR] File not found: {file_path}")
+        return
 
     print(f"Detected language '{info.language}' with probability {info.language_probability:.2f}")
 
@@ -59,6 +108,11 @@ def transcribe_file(file_path):
     print(f"Total segments: {count}")
 
 if __name__ == "__main__":
-    # 确保 sample 目录存在，这里使用相对路径
-    audio_file = "sample/test.m4a"
-    transcribe_file(audio_file)
+    # 可传入多个文件或 glob（批量转写，模型只加载一次）；默认转写 sample/test.m4a
+    if len(sys.argv) > 1:
+        audio_files = sorted({f for pattern in sys.argv[1:] for f in (glob.glob(pattern) or [pattern])})
+    else:
+        # 确保 sample 目录存在，这里使用相对路径
+        audio_files = ["sample/test.m4a"]
+    for audio_file in audio_files:
+        transcribe_file(audio_file)
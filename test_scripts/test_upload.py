@@ -1,6 +1,14 @@
 import requests
 import os
 
+try:
+    # 流式 multipart：分块发送文件内容，大文件上传内存占用恒定
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+_SESSION = requests.Session()
+
 def test_upload():
     url = 'http://localhost:3000/api/upload'
     # 创建一个临时文件
@@ -8,16 +16,19 @@ def test_upload():
     with open(filename, 'w') as f:
         f.write('Hello Fastify Upload!')
 
-    files = {'file': open(filename, 'rb')}
     try:
-        response = requests.post(url, files=files)
+        with open(filename, 'rb') as fh:
+            if MultipartEncoder is not None:
+                enc = MultipartEncoder(fields={'file': (filename, fh, 'application/octet-stream')})
+                response = _SESSION.post(url, data=enc, headers={'Content-Type': enc.content_type})
+            else:
+                # 未安装 requests-toolbelt 时退回普通上传（整个文件读入内存）
+                response = _SESSION.post(url, files={'file': fh})
         print(response.json())
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        files['file'].close()
         os.remove(filename)
 
 if __name__ == '__main__':
     test_upload()
-